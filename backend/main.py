@@ -1,24 +1,55 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, field_validator
-from typing import List, Optional
-import subprocess
-import json
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import os
 import re
+import time
+
+# CVE format: CVE-YYYY-NNNN (where YYYY is year and NNNN is at least 4 digits)
+CVE_PATTERN = re.compile(r'CVE-\d{4}-\d{4,}')
+
+# Requests only carry a CVE ID, so anything larger is rejected before parsing
+MAX_REQUEST_BODY_SIZE = 1024
+
+class MaxBodySizeMiddleware:
+    """Reject requests whose Content-Length exceeds max_body_size with a 413."""
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_body_size:
+                        response = JSONResponse(
+                            {"detail": "Request body too large"},
+                            status_code=413
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
 
 app = FastAPI(title="PoCForge Web API", version="1.0.0")
 
+# Added before CORS so that 413 responses still carry CORS headers
+app.add_middleware(MaxBodySizeMiddleware, max_body_size=MAX_REQUEST_BODY_SIZE)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],  # Vite dev server
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type"],
 )
 
 class AnalyzeRequest(BaseModel):
-    cve_id: str
+    cve_id: str = Field(max_length=32)
     
     @field_validator('cve_id')
     @classmethod
@@ -26,33 +57,36 @@ class AnalyzeRequest(BaseModel):
         if not v:
             raise ValueError('CVE ID cannot be empty')
         
-        # CVE format: CVE-YYYY-NNNN (where YYYY is year and NNNN is at least 4 digits)
-        cve_pattern = r'^CVE-\d{4}-\d{4,}$'
-        if not re.match(cve_pattern, v.upper()):
+        v = v.upper()
+        if not CVE_PATTERN.fullmatch(v):
             raise ValueError('Invalid CVE format. Expected format: CVE-YYYY-NNNN (e.g., CVE-2024-1234)')
         
-        return v.upper()
+        return v
+
+class FrozenModel(BaseModel):
+    # Response models are immutable once validated
+    model_config = ConfigDict(frozen=True)
 
-class Commit(BaseModel):
+class Commit(FrozenModel):
     url: str
     sha: str
     message: str
     repo: str
     date: str
 
-class PoC(BaseModel):
+class PoC(FrozenModel):
     commit_url: str
     commit_sha: str
-    vulnerable_function: Optional[str]
+    vulnerable_function: Optional[str] = None
     attack_vector: str
-    vulnerable_code: Optional[str]
-    fixed_code: Optional[str]
-    test_case: Optional[str]
+    vulnerable_code: Optional[str] = None
+    fixed_code: Optional[str] = None
+    test_case: Optional[str] = None
     prerequisites: List[str]
     reasoning: str
     method: str
 
-class Package(BaseModel):
+class Package(FrozenModel):
     name: str
     ecosystem: str
     vulnerable_versions: str
@@ -60,7 +94,7 @@ class Package(BaseModel):
     commits: List[Commit]
     pocs: List[PoC]
 
-class CVE(BaseModel):
+class CVE(FrozenModel):
     cve_id: str
     summary: str
     severity: str
@@ -68,65 +102,148 @@ class CVE(BaseModel):
     packages: List[Package]
     pocs_generated: int
 
-class Summary(BaseModel):
+class Summary(FrozenModel):
     total_cves: int
     total_packages: int
     pocs_generated: int
     success_rate: float
 
-class SearchParams(BaseModel):
+class SearchParams(FrozenModel):
     hours: int
     target_cve: str
     timestamp: str
 
-class PoCForgeResponse(BaseModel):
+class PoCForgeResponse(FrozenModel):
     search_params: SearchParams
     cves: List[CVE]
     summary: Summary
 
-class AnalyzeResponse(BaseModel):
+class AnalyzeResponse(FrozenModel):
     success: bool
     data: Optional[PoCForgeResponse] = None
     error: Optional[str] = None
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_cve(request: AnalyzeRequest):
+# PoCForge CLI lives in the submodule next to this file
+POCFORGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PoCForge")
+
+# Run PoCForge with its own virtualenv's interpreter when it has been synced,
+# skipping the lockfile check and resolve that `uv run` does on every call
+_pocforge_python = os.path.join(
+    POCFORGE_DIR, ".venv",
+    *(("Scripts", "python.exe") if os.name == "nt" else ("bin", "python"))
+)
+if os.path.exists(_pocforge_python):
+    POCFORGE_COMMAND = (_pocforge_python, "main.py")
+else:
+    POCFORGE_COMMAND = ("uv", "run", "main.py")
+
+# Cache of serialized /analyze responses keyed by CVE ID, plus the PoCForge
+# runs currently in flight so concurrent requests for one CVE share a run
+ANALYSIS_CACHE_TTL = 3600
+ANALYSIS_CACHE_MAX_ENTRIES = 1024
+_analysis_cache: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+_analysis_inflight: Dict[str, "asyncio.Task[bytes]"] = {}
+
+async def _run_pocforge(cve_id: str) -> bytes:
+    # Call PoCForge CLI from the submodule
+    proc = await asyncio.create_subprocess_exec(
+        *POCFORGE_COMMAND, "--cve", cve_id, "--json",
+        cwd=POCFORGE_DIR,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
     try:
-        # Call PoCForge CLI from the submodule
-        pocforge_dir = os.path.join(os.path.dirname(__file__), "PoCForge")
-        result = subprocess.run(
-            ["uv", "run", "main.py", "--cve", request.cve_id, "--json"],
-            cwd=pocforge_dir,
-            capture_output=True,
-            text=True,
-            timeout=300
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=300)
+    finally:
+        # Don't leave PoCForge running after a timeout or a cancelled task
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+    
+    if proc.returncode != 0:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"PoCForge failed: {stderr.decode(errors='replace')}"
         )
+    
+    # Parse and validate the JSON response from PoCForge in a single pass
+    response_data = PoCForgeResponse.model_validate_json(stdout)
+    
+    # Serialize with pydantic-core directly instead of going through
+    # jsonable_encoder and response_model validation, omitting null fields
+    response = AnalyzeResponse(success=True, data=response_data)
+    return response.model_dump_json(exclude_none=True).encode()
+
+async def _run_pocforge_cached(cve_id: str) -> bytes:
+    try:
+        payload = await _run_pocforge(cve_id)
+    finally:
+        del _analysis_inflight[cve_id]
+    
+    _analysis_cache[cve_id] = (time.monotonic() + ANALYSIS_CACHE_TTL, payload)
+    _analysis_cache.move_to_end(cve_id)
+    while len(_analysis_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+        _analysis_cache.popitem(last=False)
+    return payload
+
+def _consume_task_exception(task: "asyncio.Task[bytes]") -> None:
+    # Every waiter may have been cancelled before a shared run fails; retrieve
+    # the exception so asyncio doesn't log it as never retrieved
+    if not task.cancelled():
+        task.exception()
+
+async def _get_analysis(cve_id: str) -> bytes:
+    cached = _analysis_cache.get(cve_id)
+    if cached is not None:
+        expires_at, payload = cached
+        if time.monotonic() < expires_at:
+            _analysis_cache.move_to_end(cve_id)
+            return payload
+        del _analysis_cache[cve_id]
+    
+    task = _analysis_inflight.get(cve_id)
+    if task is None:
+        task = asyncio.create_task(_run_pocforge_cached(cve_id))
+        task.add_done_callback(_consume_task_exception)
+        _analysis_inflight[cve_id] = task
+    
+    # Shield the shared run so one client disconnecting doesn't cancel it
+    # for the other requests waiting on the same CVE
+    return await asyncio.shield(task)
+
+@app.post("/analyze", responses={200: {"model": AnalyzeResponse}})
+async def analyze_cve(request: AnalyzeRequest) -> Response:
+    try:
+        payload = await _get_analysis(request.cve_id)
+        return Response(content=payload, media_type="application/json")
         
-        if result.returncode != 0:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"PoCForge failed: {result.stderr}"
-            )
-        
-        # Parse the JSON response from PoCForge
-        pocforge_data = json.loads(result.stdout)
-        
-        # Convert PoCForge response to our expected format
-        response_data = PoCForgeResponse(**pocforge_data)
-        
-        return AnalyzeResponse(success=True, data=response_data)
-        
-    except subprocess.TimeoutExpired:
+    except asyncio.TimeoutError:
         raise HTTPException(status_code=408, detail="Analysis timeout")
-    except json.JSONDecodeError as e:
+    except ValidationError as e:
         raise HTTPException(status_code=500, detail=f"Invalid JSON response: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+# The root response never changes, so it is encoded once at import time
+ROOT_RESPONSE_BODY = b'{"message":"PoCForge Web API"}'
+
 @app.get("/")
-async def root():
-    return {"message": "PoCForge Web API"}
+async def root() -> Response:
+    # A fresh Response per call keeps middleware from mutating shared headers
+    return Response(content=ROOT_RESPONSE_BODY, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # The /analyze cache and in-flight coalescing are per process, so extra
+    # workers can each start their own PoCForge run for the same CVE
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    # loop/http default to "auto", which picks uvloop and httptools when
+    # installed (via uvicorn[standard])
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        access_log=False,
+        log_level="warning"
+    )
\ No newline at end of file
@@ -13,11 +13,11 @@ interface Commit {
 interface PoC {
   commit_url: string
   commit_sha: string
-  vulnerable_function: string | null
+  vulnerable_function?: string
   attack_vector: string
-  vulnerable_code: string | null
-  fixed_code: string | null
-  test_case: string | null
+  vulnerable_code?: string
+  fixed_code?: string
+  test_case?: string
   prerequisites: string[]
   reasoning: string
   method: string